@@ -1,56 +1,119 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
-from pathlib import Path
 import uvicorn
 import asyncio
 import json
-from datetime import datetime
 import os
+import threading
+import uuid
+from events import InMemoryEventBus, parse_event_id
+from prefetch import Prefetcher, RequestHistory, hot_report
+from profiling import ProfilerBusy, RunProfiler, stage
+from storage import ReportStore
 
 app = FastAPI(title="AI Research Assistant")
+report_store = ReportStore("output")
+event_bus = InMemoryEventBus()
+# (topic, refresh_from) -> job_id of the run in progress
+running_jobs = {}
+# Strong references so in-flight jobs are not garbage collected
+job_tasks = set()
+request_history = RequestHistory("output")
+# report name -> job_id of the closed channel replaying it to hot requests
+hot_jobs = {}
+prefetcher = Prefetcher(report_store, request_history)
+# Crew runs in progress for users (SSE, POST and profiled); the prefetcher yields to them
+active_crew_runs = 0
+active_crew_runs_lock = threading.Lock()
+PREFETCH_CHECK_SECONDS = 60
 
 class ResearchRequest(BaseModel):
-    topic: str
+    # Optional when refresh_from is given: defaults to that report's topic
+    topic: str = None
     depth: str = "moderate"
+    refresh_from: str = None
+    # Skip serving a recent stored report and always run the crew
+    fresh: bool = False
 
 class ResearchResponse(BaseModel):
     status: str
     report: str
     file_path: str = None
+    profile_path: str = None
     error: str = None
 
-async def research_stream(topic: str):
+def wants_profile(profile: bool, x_profile: str = None):
+    return profile or (x_profile or "").strip().lower() in ("1", "true", "yes")
+
+def start_profiler(label: str, profile: bool, x_profile: str = None):
+    if not wants_profile(profile, x_profile):
+        return None
+    try:
+        return RunProfiler(label).start()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def finish_profile(profiler, entry):
+    if profiler is None:
+        return None
+    profiler.stop()
+    return str(profiler.save(report_store.profile_path(entry["name"])))
+
+def resolve_topic(topic: str = None, refresh_from: str = None):
+    # A refresh defaults to the topic of the report it updates
+    if refresh_from:
+        try:
+            previous = report_store.info(refresh_from)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Report to refresh not found")
+        return topic or previous["topic"]
+    if not topic:
+        raise HTTPException(status_code=400, detail="topic is required unless refresh_from is given")
+    return topic
+
+def crew_busy():
+    return active_crew_runs > 0
+
+def run_crew(topic: str, refresh_from: str = None, on_section=None, profiler=None):
+    global active_crew_runs
+    from crew import ResearchCrew
+    with active_crew_runs_lock:
+        active_crew_runs += 1
     try:
-        yield f"data: {json.dumps({'status': 'starting', 'message': 'Initializing AI agents...'})}\n\n"
+        crew = ResearchCrew(profiler=profiler)
+        if not refresh_from:
+            return crew.run(topic, on_section=on_section)
+        
+        previous = report_store.info(refresh_from)
+        previous_report = report_store.read(refresh_from)
+        return crew.refresh(topic, previous_report, previous["created"][:10])
+    finally:
+        with active_crew_runs_lock:
+            active_crew_runs -= 1
+
+async def research_job(job_id: str, topic: str, refresh_from: str = None, profiler=None):
+    try:
+        event_bus.publish(job_id, {'status': 'starting', 'job_id': job_id, 'topic': topic, 'message': 'Initializing AI agents...'})
         await asyncio.sleep(0.5)
         
-        yield f"data: {json.dumps({'status': 'research', 'agent': 'Research Agent', 'message': 'Gathering information on: ' + topic})}\n\n"
+        event_bus.publish(job_id, {'status': 'research', 'agent': 'Research Agent', 'message': 'Gathering information on: ' + topic})
         await asyncio.sleep(1)
         
-        yield f"data: {json.dumps({'status': 'analysis', 'agent': 'Analyst Agent', 'message': 'Analyzing and validating findings...'})}\n\n"
+        event_bus.publish(job_id, {'status': 'analysis', 'agent': 'Analyst Agent', 'message': 'Analyzing and validating findings...'})
         await asyncio.sleep(1)
         
-        yield f"data: {json.dumps({'status': 'writing', 'agent': 'Writer Agent', 'message': 'Creating professional report...'})}\n\n"
+        event_bus.publish(job_id, {'status': 'writing', 'agent': 'Writer Agent', 'message': 'Creating professional report...'})
         await asyncio.sleep(1)
         
-        from crew import ResearchCrew
-        crew = ResearchCrew()
-        result = crew.run(topic)
-        
-        # Convert CrewOutput to string
-        result_text = str(result)
+        # Run the crew off the event loop; sections are published as they finish
+        def on_section(title, content):
+            event_bus.publish_threadsafe(job_id, {'status': 'section', 'agent': 'Writer Agent', 'title': title, 'content': content})
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_topic = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in topic)
-        safe_topic = safe_topic.replace(' ', '_').lower()[:50]
+        result_text = await asyncio.to_thread(run_crew, topic, refresh_from, on_section, profiler)
         
-        output_dir = Path("output")
-        output_dir.mkdir(exist_ok=True)
-        
-        file_path = output_dir / f"{safe_topic}_{timestamp}.md"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(result_text)
+        with stage(profiler, "save"):
+            entry = report_store.save(result_text, topic)
         
         # Create workflow visualization data
         workflow = {
@@ -72,86 +135,165 @@ async def research_stream(topic: str):
                 {
                     "name": "Writer Agent",
                     "role": "Report Creation",
-                    "task": "Created professional report with clear structure and citations",
+                    "task": "Outlined the report, wrote its body sections concurrently, then the summary, conclusion and references from that body",
                     "output": "Final research report in markdown format",
                     "icon": "✍️"
                 }
             ],
-            "process": "Sequential collaboration: Research → Analysis → Writing"
+            "process": "Research → Analysis → Outline → Parallel body sections → Summary sections"
         }
         
-        yield f"data: {json.dumps({'status': 'complete', 'message': 'Report generated!', 'report': result_text, 'file_path': str(file_path), 'workflow': workflow})}\n\n"
+        # The profile is saved after the serialize stage, so its path is known up front
+        profile_path = str(report_store.profile_path(entry['name'])) if profiler else None
+        with stage(profiler, "serialize"):
+            complete = json.dumps({'status': 'complete', 'message': 'Report generated!', 'report': result_text, 'file_path': entry['name'], 'profile_path': profile_path, 'workflow': workflow})
+        finish_profile(profiler, entry)
+        event_bus.publish(job_id, complete)
     
     except Exception as e:
-        yield f"data: {json.dumps({'status': 'error', 'message': str(e)})}\n\n"
+        if profiler:
+            profiler.stop()
+        event_bus.publish(job_id, {'status': 'error', 'message': str(e)})
+    finally:
+        event_bus.close(job_id)
+        if running_jobs.get((topic, refresh_from or "")) == job_id:
+            del running_jobs[(topic, refresh_from or "")]
+        job_tasks.discard(asyncio.current_task())
+
+def cached_report(topic: str, refresh_from: str = None, profiler=None, fresh: bool = False):
+    # Fresh, profiled and refresh requests always run the crew
+    if fresh or refresh_from or profiler:
+        return None
+    return hot_report(report_store, topic)
+
+def start_research_job(topic: str, refresh_from: str = None, profiler=None, fresh: bool = False):
+    job_id = uuid.uuid4().hex[:12]
+    hot = cached_report(topic, refresh_from, profiler, fresh)
+    if hot:
+        request_history.record(topic, "hot", hot["filename"], hot["source"])
+        # Every viewer of the same stored report replays one shared channel
+        hot_job = hot_jobs.get(hot["filename"])
+        if hot_job and event_bus.exists(hot_job):
+            return hot_job
+        for name in [n for n, j in hot_jobs.items() if not event_bus.exists(j)]:
+            del hot_jobs[name]
+        hot_jobs[hot["filename"]] = job_id
+        event_bus.open(job_id)
+        event_bus.publish(job_id, {'status': 'starting', 'job_id': job_id, 'topic': topic, 'message': 'Found a recent report'})
+        event_bus.publish(job_id, {'status': 'complete', 'message': f"Served recent report from {hot['created'][:16].replace('T', ' ')}", 'report': report_store.read(hot['filename']), 'file_path': hot['filename'], 'cached': True})
+        event_bus.close(job_id)
+        return job_id
+    
+    # Viewers asking for a topic that is already being researched share that
+    # job; profiled requests get their own run so the profile covers it all
+    key = (topic, refresh_from or "")
+    running_job = running_jobs.get(key)
+    if running_job and event_bus.is_open(running_job) and not profiler:
+        request_history.record(topic, "joined")
+        return running_job
+    
+    request_history.record(topic, "refresh" if refresh_from else "cold")
+    event_bus.open(job_id)
+    if not profiler:
+        running_jobs[key] = job_id
+    job_tasks.add(asyncio.create_task(research_job(job_id, topic, refresh_from, profiler)))
+    return job_id
+
+async def prefetch_loop():
+    while True:
+        await asyncio.sleep(PREFETCH_CHECK_SECONDS)
+        try:
+            if crew_busy() or not prefetcher.should_run():
+                continue
+            await asyncio.to_thread(prefetcher.run_once, should_stop=crew_busy)
+        except Exception as e:
+            print(f"Prefetch failed: {e}")
+
+@app.on_event("startup")
+async def start_prefetcher():
+    job_tasks.add(asyncio.create_task(prefetch_loop()))
+
 
 @app.get("/", response_class=HTMLResponse)
 async def home():
     return HTMLResponse(content=get_default_html())
 
 @app.get("/api/research/stream")
-async def research_stream_endpoint(topic: str):
+async def research_stream_endpoint(topic: str = None, refresh_from: str = None, job_id: str = None,
+                                   fresh: bool = False, profile: bool = False, x_profile: str = Header(None),
+                                   last_event_id: str = Header(None)):
+    # A reconnecting EventSource resends the original URL plus Last-Event-ID,
+    # so resume the job it was watching rather than starting a new one
+    resumed_job, after = parse_event_id(last_event_id)
+    job_id = job_id or resumed_job
+    if resumed_job != job_id:
+        after = 0
+    
+    if job_id:
+        if not event_bus.exists(job_id):
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+    elif topic or refresh_from:
+        topic = resolve_topic(topic, refresh_from)
+        profiler = start_profiler(topic, profile, x_profile)
+        job_id = start_research_job(topic, refresh_from, profiler, fresh)
+    else:
+        raise HTTPException(status_code=400, detail="One of topic, refresh_from or job_id is required")
+    
     return StreamingResponse(
-        research_stream(topic),
-        media_type="text/event-stream"
+        event_bus.subscribe(job_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @app.post("/api/research", response_model=ResearchResponse)
-async def create_research(request: ResearchRequest):
+async def create_research(request: ResearchRequest, profile: bool = False, x_profile: str = Header(None)):
+    topic = resolve_topic(request.topic, request.refresh_from)
+    profiler = start_profiler(topic, profile, x_profile)
     try:
-        from crew import ResearchCrew
-        crew = ResearchCrew()
-        result = crew.run(request.topic)
-        
-        # Convert CrewOutput to string
-        result_text = str(result)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_topic = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in request.topic)
-        safe_topic = safe_topic.replace(' ', '_').lower()[:50]
+        hot = cached_report(topic, request.refresh_from, profiler, request.fresh)
+        if hot:
+            request_history.record(topic, "hot", hot["filename"], hot["source"])
+            return ResearchResponse(
+                status="success",
+                report=report_store.read(hot["filename"]),
+                file_path=hot["filename"]
+            )
         
-        output_dir = Path("output")
-        output_dir.mkdir(exist_ok=True)
+        request_history.record(topic, "refresh" if request.refresh_from else "cold")
+        result_text = await asyncio.to_thread(run_crew, topic, request.refresh_from, profiler=profiler)
         
-        file_path = output_dir / f"{safe_topic}_{timestamp}.md"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(result_text)
+        with stage(profiler, "save"):
+            entry = report_store.save(result_text, topic)
         
         return ResearchResponse(
             status="success",
             report=result_text,
-            file_path=str(file_path)
+            file_path=entry["name"],
+            profile_path=finish_profile(profiler, entry)
         )
     except Exception as e:
+        if profiler:
+            profiler.stop()
         return ResearchResponse(
             status="error",
             report="",
             error=str(e)
         )
 
+@app.get("/api/prefetch/stats")
+async def prefetch_stats(days: int = 7):
+    return prefetcher.stats(days)
+
 @app.get("/api/reports")
 async def list_reports():
-    output_dir = Path("output")
-    if not output_dir.exists():
-        return {"reports": []}
-    
-    reports = []
-    for file in sorted(output_dir.glob("*.md"), reverse=True):
-        reports.append({
-            "filename": file.name,
-            "created": datetime.fromtimestamp(file.stat().st_mtime).isoformat(),
-            "size": file.stat().st_size
-        })
-    return {"reports": reports}
+    return {"reports": report_store.list()}
 
 @app.get("/api/reports/{filename}")
 async def get_report(filename: str):
-    file_path = Path("output") / filename
-    if not file_path.exists():
+    try:
+        content = report_store.read(filename)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Report not found")
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
     return {"content": content}
 
 def get_default_html():
@@ -493,19 +635,35 @@ def get_default_html():
             form.addEventListener('submit', async (e) => {
                 e.preventDefault();
                 const topic = document.getElementById('topic').value;
-                
+                watchResearch(`/api/research/stream?topic=${encodeURIComponent(topic)}`);
+            });
+            
+            function finishWatching(eventSource) {
+                eventSource.close();
+                sessionStorage.removeItem('researchJob');
+                loading.style.display = 'none';
+                submitBtn.disabled = false;
+            }
+            
+            function watchResearch(url) {
                 loading.style.display = 'block';
                 submitBtn.disabled = true;
                 resultDiv.innerHTML = '<div style="color: #667eea; font-family: sans-serif;"><strong>Starting research...</strong></div>';
                 
-                const eventSource = new EventSource(`/api/research/stream?topic=${encodeURIComponent(topic)}`);
+                // The job keeps running server-side; a reload or a second viewer
+                // reattaches by job id and replays its progress
+                const eventSource = new EventSource(url);
                 
                 eventSource.onmessage = (event) => {
                     const data = JSON.parse(event.data);
                     
                     if (data.status === 'starting') {
+                        sessionStorage.setItem('researchJob', data.job_id);
                         resultDiv.innerHTML = `<div style="color: #667eea;">🚀 ${data.message}</div>`;
                     }
+                    else if (data.status === 'lagged') {
+                        resultDiv.innerHTML += `<div style="color: #94a3b8; margin-top: 10px;">… ${data.skipped} earlier updates skipped</div>`;
+                    }
                     else if (data.status === 'research') {
                         resultDiv.innerHTML += `<div style="color: #28a745; margin-top: 10px;">📚 <strong>${data.agent}:</strong> ${data.message}</div>`;
                     }
@@ -515,6 +673,12 @@ def get_default_html():
                     else if (data.status === 'writing') {
                         resultDiv.innerHTML += `<div style="color: #17a2b8; margin-top: 10px;">✍️ <strong>${data.agent}:</strong> ${data.message}</div>`;
                     }
+                    else if (data.status === 'section') {
+                        const section = document.createElement('pre');
+                        section.style.cssText = "white-space: pre-wrap; margin-top: 10px; padding-left: 10px; border-left: 3px solid #17a2b8;";
+                        section.textContent = data.content;
+                        resultDiv.appendChild(section);
+                    }
                     else if (data.status === 'complete') {
                         // Display report
                         resultDiv.innerHTML = `
@@ -546,26 +710,28 @@ def get_default_html():
                             resultDiv.innerHTML += workflowHTML;
                         }
                         
-                        eventSource.close();
-                        loading.style.display = 'none';
-                        submitBtn.disabled = false;
+                        finishWatching(eventSource);
                         loadReports();
                     }
                     else if (data.status === 'error') {
                         resultDiv.innerHTML = `<div style="color: #dc3545;">❌ Error: ${data.message}</div>`;
-                        eventSource.close();
-                        loading.style.display = 'none';
-                        submitBtn.disabled = false;
+                        finishWatching(eventSource);
                     }
                 };
                 
                 eventSource.onerror = (error) => {
-                    resultDiv.innerHTML = '<div style="color: #dc3545;">❌ Connection error. Please try again.</div>';
-                    eventSource.close();
-                    loading.style.display = 'none';
-                    submitBtn.disabled = false;
+                    // While CONNECTING the browser retries with Last-Event-ID and resumes
+                    if (eventSource.readyState === EventSource.CLOSED) {
+                        resultDiv.innerHTML = '<div style="color: #dc3545;">❌ Connection error. Please try again.</div>';
+                        finishWatching(eventSource);
+                    }
                 };
-            });
+            }
+            
+            const activeJob = sessionStorage.getItem('researchJob');
+            if (activeJob) {
+                watchResearch(`/api/research/stream?job_id=${encodeURIComponent(activeJob)}`);
+            }
             
             async function loadReports() {
                 const response = await fetch('/api/reports');
@@ -1,27 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from crewai import Crew, Process
 from agents import ResearchAgents
-from tasks import ResearchTasks
+from tasks import ResearchTasks, BODY_SECTIONS, REPORT_SECTIONS, SUMMARY_SECTIONS
+from profiling import profile_worker, stage
+from sections import assemble_report, find_section, join_sections, merge_sections, normalize_section, split_sections
 
 class ResearchCrew:
-    def __init__(self):
+    def __init__(self, profiler=None):
         self.agents_factory = ResearchAgents()
         self.tasks_factory = ResearchTasks()
+        self.profiler = profiler
+        # LLM tokens used by this crew across all kickoffs, including parallel sections
+        self.total_tokens = 0
+        self._tokens_lock = threading.Lock()
     
-    def run(self, topic):
+    def _kickoff(self, agents, tasks):
+        crew = Crew(
+            agents=agents,
+            tasks=tasks,
+            process=Process.sequential,
+            verbose=True
+        )
+        result = crew.kickoff()
+        usage = getattr(result, "token_usage", None)
+        with self._tokens_lock:
+            self.total_tokens += getattr(usage, "total_tokens", 0) or 0
+        return result
+    
+    def run(self, topic, on_section=None):
+        """Research ``topic`` and return the assembled markdown report.
+        
+        Research, analysis and a short outline run one after another, each
+        its own kickoff so they are profiled as separate stages. The body
+        sections are then written concurrently, one writer call each, followed
+        by the summary sections (executive summary, conclusion, references),
+        which are written from the finished body so they agree with it.
+        ``on_section(title, text)`` is called as each section finishes.
+        """
         researcher = self.agents_factory.research_agent()
         analyst = self.agents_factory.analyst_agent()
         writer = self.agents_factory.writer_agent()
         
         research_task = self.tasks_factory.research_task(researcher, topic)
-        analysis_task = self.tasks_factory.analysis_task(analyst, topic)
-        writing_task = self.tasks_factory.writing_task(writer, topic)
+        analysis_task = self.tasks_factory.analysis_task(analyst, topic, context=[research_task])
+        outline_task = self.tasks_factory.outline_task(writer, topic, context=[research_task, analysis_task])
         
-        crew = Crew(
-            agents=[researcher, analyst, writer],
-            tasks=[research_task, analysis_task, writing_task],
-            process=Process.sequential,
-            verbose=True
+        with stage(self.profiler, "research"):
+            self._kickoff([researcher], [research_task])
+        with stage(self.profiler, "analysis"):
+            self._kickoff([analyst], [analysis_task])
+        with stage(self.profiler, "outline"):
+            self._kickoff([writer], [outline_task])
+        
+        return self._write_sections(
+            topic,
+            research_task.output.raw,
+            analysis_task.output.raw,
+            outline_task.output.raw,
+            on_section
         )
+    
+    def _write_section(self, topic, title, outline, findings, analysis, body=None):
+        with profile_worker(self.profiler):
+            # Agents keep per-run executor state, so each thread gets its own
+            writer = self.agents_factory.writer_agent()
+            task = self.tasks_factory.section_task(writer, topic, title, outline, findings, analysis, body)
+            return str(self._kickoff([writer], [task]))
+    
+    def _write_phase(self, titles, written, topic, planned, findings, analysis, body=None, on_section=None):
+        with ThreadPoolExecutor(max_workers=len(titles)) as executor:
+            futures = {
+                executor.submit(
+                    self._write_section,
+                    topic,
+                    title,
+                    find_section(planned, title),
+                    findings,
+                    analysis,
+                    body
+                ): title
+                for title in titles
+            }
+            for future in as_completed(futures):
+                title = futures[future]
+                written[title] = future.result()
+                if on_section:
+                    on_section(title, normalize_section(title, written[title]))
+    
+    def _write_sections(self, topic, findings, analysis, outline, on_section=None):
+        _, planned = split_sections(outline)
+        written = {}
+        with stage(self.profiler, "writing"):
+            self._write_phase(BODY_SECTIONS, written, topic, planned, findings, analysis, on_section=on_section)
         
-        result = crew.kickoff()
-        return result
+        body = join_sections("", [(title, normalize_section(title, written[title])) for title in BODY_SECTIONS])
+        with stage(self.profiler, "summary"):
+            self._write_phase(SUMMARY_SECTIONS, written, topic, planned, findings, analysis, body, on_section)
+        
+        with stage(self.profiler, "assembly"):
+            return assemble_report(topic, [(title, written[title]) for title in REPORT_SECTIONS])
+    
+    def refresh(self, topic, previous_report, since):
+        """Update a previous report with developments newer than ``since``.
+        
+        The writer only returns the sections that changed; they are merged
+        into ``previous_report`` here, so unchanged sections cost no tokens.
+        """
+        researcher = self.agents_factory.research_agent()
+        analyst = self.agents_factory.analyst_agent()
+        writer = self.agents_factory.writer_agent()
+        
+        research_task = self.tasks_factory.refresh_research_task(researcher, topic, since)
+        analysis_task = self.tasks_factory.refresh_analysis_task(analyst, topic, previous_report)
+        writing_task = self.tasks_factory.refresh_writing_task(writer, topic, previous_report)
+        
+        with stage(self.profiler, "refresh"):
+            patch = self._kickoff(
+                [researcher, analyst, writer],
+                [research_task, analysis_task, writing_task]
+            )
+        with stage(self.profiler, "assembly"):
+            return merge_sections(previous_report, str(patch))
@@ -0,0 +1,140 @@
+import abc
+import asyncio
+import itertools
+import json
+from collections import deque
+
+DEFAULT_BUFFER_SIZE = 256
+DEFAULT_RETENTION_SECONDS = 600
+KEEPALIVE_SECONDS = 15
+
+
+class EventBus(abc.ABC):
+    """Per-job progress events with replay, shared by any number of viewers.
+
+    Implementations publish each event once into a bounded per-job history;
+    subscribers read that history at their own pace, so a slow client never
+    blocks the job or other viewers. Event ids are ``"{job_id}:{seq}"`` and
+    can be passed back as ``Last-Event-ID`` to resume.
+
+    ``InMemoryEventBus`` serves a single process; a shared backend (e.g.
+    Redis streams) can implement the same methods.
+    """
+
+    @abc.abstractmethod
+    def open(self, job_id):
+        ...
+
+    @abc.abstractmethod
+    def exists(self, job_id):
+        ...
+
+    @abc.abstractmethod
+    def is_open(self, job_id):
+        ...
+
+    @abc.abstractmethod
+    def publish(self, job_id, event):
+        """Append ``event`` (a dict, or its JSON text if already serialized)."""
+
+    @abc.abstractmethod
+    def publish_threadsafe(self, job_id, event):
+        ...
+
+    @abc.abstractmethod
+    def close(self, job_id):
+        ...
+
+    @abc.abstractmethod
+    def subscribe(self, job_id, after=0):
+        ...
+
+
+def parse_event_id(event_id):
+    """Split a ``"{job_id}:{seq}"`` event id; returns ``(None, 0)`` if malformed."""
+    job_id, _, seq = (event_id or "").rpartition(":")
+    if not job_id or not seq.isdigit():
+        return None, 0
+    return job_id, int(seq)
+
+
+class _Channel:
+    def __init__(self, job_id, buffer_size):
+        self.job_id = job_id
+        # (seq, frame) pairs; frames are serialized once, at publish time
+        self.buffer = deque(maxlen=buffer_size)
+        self.next_seq = 1
+        self.closed = False
+        self.wakeup = asyncio.Event()
+
+    def notify(self):
+        # Swap the event so every current waiter wakes exactly once
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+    @property
+    def oldest_seq(self):
+        return self.buffer[0][0] if self.buffer else self.next_seq
+
+    def frames_after(self, seq):
+        start = max(seq + 1 - self.oldest_seq, 0)
+        return list(itertools.islice(self.buffer, start, None))
+
+
+class InMemoryEventBus(EventBus):
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, retention_seconds=DEFAULT_RETENTION_SECONDS):
+        self.buffer_size = buffer_size
+        self.retention_seconds = retention_seconds
+        self._channels = {}
+        self._loop = None
+
+    def open(self, job_id):
+        self._loop = asyncio.get_running_loop()
+        self._channels[job_id] = _Channel(job_id, self.buffer_size)
+
+    def exists(self, job_id):
+        return job_id in self._channels
+
+    def is_open(self, job_id):
+        channel = self._channels.get(job_id)
+        return channel is not None and not channel.closed
+
+    def publish(self, job_id, event):
+        channel = self._channels[job_id]
+        seq = channel.next_seq
+        channel.next_seq += 1
+        data = event if isinstance(event, str) else json.dumps(event)
+        channel.buffer.append((seq, f"id: {job_id}:{seq}\ndata: {data}\n\n"))
+        channel.notify()
+        return seq
+
+    def publish_threadsafe(self, job_id, event):
+        self._loop.call_soon_threadsafe(self.publish, job_id, event)
+
+    def close(self, job_id):
+        channel = self._channels[job_id]
+        channel.closed = True
+        channel.notify()
+        # Keep the history around for late viewers and reconnects, then drop it
+        self._loop.call_later(self.retention_seconds, self._channels.pop, job_id, None)
+
+    async def subscribe(self, job_id, after=0):
+        """Yield SSE frames for ``job_id`` after sequence number ``after``."""
+        channel = self._channels[job_id]
+        seq = after
+        while True:
+            wakeup = channel.wakeup
+            if seq + 1 < channel.oldest_seq:
+                # Fell behind the ring buffer: report the gap and skip ahead
+                skipped = channel.oldest_seq - seq - 1
+                seq = channel.oldest_seq - 1
+                yield f"data: {json.dumps({'status': 'lagged', 'skipped': skipped})}\n\n"
+                continue
+            for seq, frame in channel.frames_after(seq):
+                yield frame
+            if channel.closed and seq >= channel.next_seq - 1:
+                return
+            try:
+                await asyncio.wait_for(wakeup.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
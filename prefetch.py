@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from dotenv import load_dotenv
+from storage import ReportStore, slugify_topic
+
+load_dotenv()
+
+# Daily LLM token allowance for prefetching; 0 disables the prefetcher
+TOKEN_BUDGET = int(os.getenv("PREFETCH_TOKEN_BUDGET", "200000"))
+TOP_TOPICS = int(os.getenv("PREFETCH_TOP_TOPICS", "5"))
+# Reports younger than this are served instead of running the crew again
+MAX_AGE_HOURS = float(os.getenv("PREFETCH_MAX_AGE_HOURS", "24"))
+IDLE_SECONDS = int(os.getenv("PREFETCH_IDLE_SECONDS", "300"))
+
+
+def _parse_off_peak(value):
+    """Parse ``"start-end"`` local hours (0-24) into a tuple, or None if empty."""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        start, end = (int(h) for h in value.split("-"))
+    except ValueError:
+        start = end = -1
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        raise ValueError(f"PREFETCH_OFF_PEAK_HOURS must look like '1-6' (hours 0-24), got {value!r}")
+    return start, end
+
+
+# Optional "start-end" local hours, e.g. "1-6"; empty means whenever idle
+OFF_PEAK_HOURS = _parse_off_peak(os.getenv("PREFETCH_OFF_PEAK_HOURS", ""))
+
+HISTORY_DAYS = 14
+MIN_REQUESTS = 2
+# Topics whose last prefetch failed are skipped for this long
+FAILURE_BACKOFF_HOURS = 6
+# Used until real runs have been measured
+DEFAULT_COST = {"cold": 40000, "refresh": 15000}
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value)
+
+
+def is_fresh(report, now=None):
+    now = now or datetime.now()
+    return _parse_time(report["created"]) >= now - timedelta(hours=MAX_AGE_HOURS)
+
+
+def hot_report(store, topic, now=None):
+    """Return the newest report on ``topic`` if it is fresh enough to serve."""
+    if MAX_AGE_HOURS <= 0:
+        return None
+    report = store.latest(topic)
+    return report if report and is_fresh(report, now) else None
+
+
+def in_off_peak(now=None):
+    if OFF_PEAK_HOURS is None:
+        return True
+    start, end = OFF_PEAK_HOURS
+    hour = (now or datetime.now()).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+class RequestHistory:
+    """Append-only log of research requests and how each was served."""
+
+    def __init__(self, root="output"):
+        self.path = Path(root) / "history.jsonl"
+        self._lock = threading.Lock()
+        self.last_request = time.monotonic()
+
+    def record(self, topic, served, report=None, source=None):
+        entry = {"time": datetime.now().isoformat(), "topic": topic, "served": served}
+        if report:
+            entry["report"] = report
+            entry["source"] = source
+        with self._lock:
+            self.last_request = time.monotonic()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_request
+
+    def load(self, since=None):
+        if not self.path.exists():
+            return []
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since is None or _parse_time(entry["time"]) >= since:
+                    entries.append(entry)
+        return entries
+
+
+def rank_topics(entries, now=None, top_n=TOP_TOPICS):
+    """Rank requested topics by overall frequency plus recent growth.
+
+    A topic scores its average requests per day over the history window,
+    plus how far its last 24 hours exceed that baseline, so both steadily
+    popular and newly rising subjects surface.
+    """
+    now = now or datetime.now()
+    recent_since = now - timedelta(days=1)
+    totals = Counter()
+    recent = Counter()
+    spellings = defaultdict(Counter)
+    for entry in entries:
+        slug = slugify_topic(entry["topic"])
+        totals[slug] += 1
+        spellings[slug][entry["topic"]] += 1
+        if _parse_time(entry["time"]) >= recent_since:
+            recent[slug] += 1
+
+    ranked = []
+    for slug, total in totals.items():
+        if total < MIN_REQUESTS:
+            continue
+        baseline = (total - recent[slug]) / (HISTORY_DAYS - 1)
+        score = total / HISTORY_DAYS + max(recent[slug] - baseline, 0)
+        ranked.append({
+            "topic": spellings[slug].most_common(1)[0][0],
+            "requests": total,
+            "recent": recent[slug],
+            "score": round(score, 3),
+        })
+    ranked.sort(key=lambda r: r["score"], reverse=True)
+    return ranked[:top_n]
+
+
+class Prefetcher:
+    """Pre-generates or refreshes reports on popular topics within a token budget."""
+
+    LEDGER_FILE = "prefetch_stats.json"
+    MAX_LEDGER_RUNS = 500
+
+    def __init__(self, store, history, token_budget=TOKEN_BUDGET):
+        self.store = store
+        self.history = history
+        self.token_budget = token_budget
+        self.ledger_path = store.root / self.LEDGER_FILE
+        self._lock = threading.Lock()
+
+    def _load_ledger(self):
+        if not self.ledger_path.exists():
+            return {"runs": []}
+        with open(self.ledger_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_ledger(self, ledger):
+        ledger["runs"] = ledger["runs"][-self.MAX_LEDGER_RUNS:]
+        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.ledger_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(tmp_path, self.ledger_path)
+
+    def tokens_spent_today(self, ledger=None):
+        ledger = ledger or self._load_ledger()
+        today = datetime.now().date().isoformat()
+        return sum(r["tokens"] for r in ledger["runs"] if r["time"].startswith(today))
+
+    def _estimate(self, ledger, mode):
+        costs = [
+            r["tokens"] for r in ledger["runs"]
+            if r["mode"] == mode and not r.get("estimated") and not r.get("failed")
+        ][-10:]
+        return sum(costs) / len(costs) if costs else DEFAULT_COST[mode]
+
+    def _failed_recently(self, ledger, topic, now):
+        since = now - timedelta(hours=FAILURE_BACKOFF_HOURS)
+        slug = slugify_topic(topic)
+        return any(
+            r.get("failed") and slugify_topic(r["topic"]) == slug and _parse_time(r["time"]) >= since
+            for r in ledger["runs"]
+        )
+
+    def should_run(self):
+        return (
+            self.token_budget > 0
+            and self.history.idle_seconds() >= IDLE_SECONDS
+            and in_off_peak()
+        )
+
+    def run_once(self, should_stop=None):
+        """Prefetch the top topics that lack a fresh report; returns the runs made.
+
+        Every run is charged to the ledger, including one that fails, and a
+        topic that failed is skipped for ``FAILURE_BACKOFF_HOURS``.
+        ``should_stop`` is checked between topics so user traffic can reclaim
+        capacity; a crew run already in progress is not interrupted.
+        """
+        from crew import ResearchCrew
+
+        if not self._lock.acquire(blocking=False):
+            return []
+        try:
+            now = datetime.now()
+            ledger = self._load_ledger()
+            remaining = self.token_budget - self.tokens_spent_today(ledger)
+            ranked = rank_topics(self.history.load(since=now - timedelta(days=HISTORY_DAYS)), now)
+            runs = []
+            for candidate in ranked:
+                if should_stop and should_stop():
+                    break
+                topic = candidate["topic"]
+                if self._failed_recently(ledger, topic, now):
+                    continue
+                latest = self.store.latest(topic)
+                if latest and is_fresh(latest, now):
+                    continue
+                mode = "refresh" if latest else "cold"
+                estimate = self._estimate(ledger, mode)
+                if estimate > remaining:
+                    continue
+
+                crew = ResearchCrew()
+                report = None
+                try:
+                    if mode == "refresh":
+                        previous_report = self.store.read(latest["filename"])
+                        result_text = crew.refresh(topic, previous_report, latest["created"][:10])
+                    else:
+                        result_text = crew.run(topic)
+                    report = self.store.save(result_text, topic, source="prefetch")["name"]
+                finally:
+                    # A failed run has still spent tokens, so it is charged too
+                    run = {
+                        "time": datetime.now().isoformat(),
+                        "topic": topic,
+                        "mode": mode,
+                        "report": report,
+                        # Fall back to the estimate if the LLM reported no usage
+                        "tokens": crew.total_tokens or round(estimate),
+                        "estimated": not crew.total_tokens,
+                        "failed": report is None,
+                    }
+                    ledger["runs"].append(run)
+                    self._save_ledger(ledger)
+                    remaining -= run["tokens"]
+                runs.append(run)
+            return runs
+        finally:
+            self._lock.release()
+
+    def stats(self, days=7):
+        """Hit-rate report: how many requests were served hot, and at what token cost."""
+        since = datetime.now() - timedelta(days=days)
+        entries = self.history.load(since=since)
+        runs = [r for r in self._load_ledger()["runs"] if _parse_time(r["time"]) >= since]
+
+        hot = [e for e in entries if e["served"] == "hot"]
+        prefetch_hits = [e for e in hot if e.get("source") == "prefetch"]
+        prefetched = {r["report"] for r in runs if r.get("report")}
+        used = prefetched & {e.get("report") for e in prefetch_hits}
+        tokens = sum(r["tokens"] for r in runs)
+        return {
+            "days": days,
+            "requests": len(entries),
+            "hot": len(hot),
+            "hit_rate": round(len(hot) / len(entries), 3) if entries else 0.0,
+            "prefetch_hits": len(prefetch_hits),
+            "prefetch_hit_rate": round(len(prefetch_hits) / len(entries), 3) if entries else 0.0,
+            "prefetched_reports": len(prefetched),
+            "failed_prefetches": sum(1 for r in runs if r.get("failed")),
+            "prefetched_reports_used": len(used),
+            "prefetch_tokens": tokens,
+            "tokens_per_prefetch_hit": round(tokens / len(prefetch_hits)) if prefetch_hits else None,
+            "token_budget_per_day": self.token_budget,
+            "tokens_spent_today": self.tokens_spent_today(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch reports on popular research topics")
+    parser.add_argument("command", choices=["rank", "run", "stats"],
+                       help="rank: show candidate topics; run: prefetch now; stats: hit-rate report")
+    parser.add_argument("--days", type=int, default=7, help="Window for stats")
+    args = parser.parse_args()
+
+    store = ReportStore("output")
+    history = RequestHistory("output")
+    prefetcher = Prefetcher(store, history)
+
+    if args.command == "rank":
+        entries = history.load(since=datetime.now() - timedelta(days=HISTORY_DAYS))
+        for candidate in rank_topics(entries):
+            print(f"{candidate['score']:>8.2f}  {candidate['requests']:>4} total  {candidate['recent']:>3} recent  {candidate['topic']}")
+    elif args.command == "run":
+        for run in prefetcher.run_once():
+            print(f"{run['mode']:<8}{run['tokens']:>8} tokens  {run['report'] or 'failed'}")
+    else:
+        print(json.dumps(prefetcher.stats(args.days), indent=2))
+
+
+if __name__ == "__main__":
+    main()
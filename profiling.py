@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+TOP_FUNCTIONS = 25
+
+# tracemalloc and process CPU time are process-wide, so one profiled run at a time
+_active_run = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class RunProfiler:
+    """Collects a per-stage CPU, memory and wait-time breakdown of one run.
+
+    Each ``stage`` records wall time, process CPU time, their difference
+    (time spent waiting, mostly on LLM network calls), the tracemalloc peak
+    and the hottest functions from cProfile. cProfile only sees the thread
+    that entered the stage; worker threads wrapped in ``profile_worker`` get
+    their own profiler, merged into the hottest functions of the stage that
+    is running when they finish.
+
+    Memory peaks and CPU time are process-wide: they include any unprofiled
+    work running alongside. Only one profiler can be started at a time;
+    ``start`` raises ``ProfilerBusy`` otherwise.
+    """
+
+    def __init__(self, label=""):
+        self.label = label
+        self.started = datetime.now()
+        self.stages = []
+        self._started_tracemalloc = False
+        self._running = False
+        # Finished worker-thread profiles, merged into the current stage
+        self._worker_profiles = []
+        self._worker_lock = threading.Lock()
+
+    def start(self):
+        if not _active_run.acquire(blocking=False):
+            raise ProfilerBusy("Another profiled run is in progress; try again when it finishes")
+        self._running = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self._running:
+            self._running = False
+            _active_run.release()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profile = _enable_profile()
+        with self._worker_lock:
+            self._worker_profiles = []
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            if profile is not None:
+                profile.disable()
+            with self._worker_lock:
+                profiles = [p for p in [profile] + self._worker_profiles if p is not None]
+                self._worker_profiles = []
+            peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            self.stages.append({
+                "name": name,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "wait_s": round(max(wall - cpu, 0.0), 4),
+                "peak_memory_bytes": peak,
+                "top_functions": _top_functions(profiles) if profiles else None,
+            })
+
+    @contextlib.contextmanager
+    def worker(self):
+        """Profile the calling worker thread as part of the current stage."""
+        profile = _enable_profile()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                with self._worker_lock:
+                    self._worker_profiles.append(profile)
+
+    def to_dict(self):
+        wall = sum(s["wall_s"] for s in self.stages)
+        cpu = sum(s["cpu_s"] for s in self.stages)
+        peaks = [s["peak_memory_bytes"] for s in self.stages if s["peak_memory_bytes"] is not None]
+        return {
+            "label": self.label,
+            "started": self.started.isoformat(),
+            "totals": {
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "wait_s": round(max(wall - cpu, 0.0), 4),
+                "peak_memory_bytes": max(peaks) if peaks else None,
+            },
+            "stages": self.stages,
+        }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def stage(profiler, name):
+    """``profiler.stage(name)``, or a no-op when profiling is off."""
+    return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+
+
+def profile_worker(profiler):
+    """``profiler.worker()``, or a no-op when profiling is off."""
+    return profiler.worker() if profiler is not None else contextlib.nullcontext()
+
+
+def _enable_profile():
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is active in this interpreter (e.g. a debugger or coverage)
+        return None
+    return profile
+
+
+def _top_functions(profiles):
+    stats = pstats.Stats(*profiles)
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({function})",
+            "ncalls": ncalls,
+            "tottime_s": round(tottime, 4),
+            "cumtime_s": round(cumtime, 4),
+        })
+    rows.sort(key=lambda r: r["cumtime_s"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+def _format_bytes(value):
+    if value is None:
+        return "-"
+    return f"{value / (1024 * 1024):.1f}MB"
+
+
+def _delta(a, b):
+    if a is None or b is None:
+        return "-"
+    return f"{b - a:+.2f}"
+
+
+def compare(path_a, path_b):
+    with open(path_a, 'r', encoding='utf-8') as f:
+        a = json.load(f)
+    with open(path_b, 'r', encoding='utf-8') as f:
+        b = json.load(f)
+
+    stages_a = {s["name"]: s for s in a["stages"]}
+    stages_b = {s["name"]: s for s in b["stages"]}
+    names = list(stages_a) + [n for n in stages_b if n not in stages_a]
+
+    print(f"A: {path_a} ({a.get('label')}, {a.get('started')})")
+    print(f"B: {path_b} ({b.get('label')}, {b.get('started')})")
+    print(f"\n{'stage':<14}{'wall A':>10}{'wall B':>10}{'Δwall':>10}{'cpu Δ':>10}{'wait Δ':>10}{'peak A':>10}{'peak B':>10}")
+    print("-" * 84)
+    empty = {"wall_s": None, "cpu_s": None, "wait_s": None, "peak_memory_bytes": None}
+    for name in names + ["TOTAL"]:
+        sa = a["totals"] if name == "TOTAL" else stages_a.get(name, empty)
+        sb = b["totals"] if name == "TOTAL" else stages_b.get(name, empty)
+        wall_a = "-" if sa["wall_s"] is None else f"{sa['wall_s']:.2f}"
+        wall_b = "-" if sb["wall_s"] is None else f"{sb['wall_s']:.2f}"
+        print(
+            f"{name:<14}{wall_a:>10}{wall_b:>10}"
+            f"{_delta(sa['wall_s'], sb['wall_s']):>10}"
+            f"{_delta(sa['cpu_s'], sb['cpu_s']):>10}"
+            f"{_delta(sa['wait_s'], sb['wait_s']):>10}"
+            f"{_format_bytes(sa['peak_memory_bytes']):>10}"
+            f"{_format_bytes(sb['peak_memory_bytes']):>10}"
+        )
+
+
+def show(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    print(f"{path} ({data.get('label')}, {data.get('started')})")
+    for s in data["stages"] + [dict(data["totals"], name="TOTAL")]:
+        print(
+            f"{s['name']:<14}wall {s['wall_s']:>8.2f}s  cpu {s['cpu_s']:>8.2f}s  "
+            f"wait {s['wait_s']:>8.2f}s  peak {_format_bytes(s['peak_memory_bytes']):>8}"
+        )
+        for fn in (s.get("top_functions") or [])[:5]:
+            print(f"    {fn['cumtime_s']:>8.3f}s  {fn['function']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and compare research run profiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show_parser = subparsers.add_parser("show", help="Print one profile")
+    show_parser.add_argument("profile")
+    compare_parser = subparsers.add_parser("compare", help="Compare two profiles stage by stage")
+    compare_parser.add_argument("a")
+    compare_parser.add_argument("b")
+
+    args = parser.parse_args()
+    if args.command == "show":
+        show(args.profile)
+    else:
+        compare(args.a, args.b)
+
+
+if __name__ == "__main__":
+    main()
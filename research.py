@@ -1,61 +1,81 @@
 import argparse
 import os
-from datetime import datetime
-from pathlib import Path
 from crew import ResearchCrew
+from profiling import RunProfiler, stage
+from storage import ReportStore, slugify_topic
 
-def create_output_dir():
-    output_dir = Path("output")
-    output_dir.mkdir(exist_ok=True)
-    return output_dir
+report_store = ReportStore("output")
 
 def save_report(content, topic, output_format="markdown"):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_topic = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in topic)
-    safe_topic = safe_topic.replace(' ', '_').lower()[:50]
-    
-    output_dir = create_output_dir()
-    
+    entry = None
     if output_format in ["markdown", "both"]:
-        md_path = output_dir / f"{safe_topic}_{timestamp}.md"
-        with open(md_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"\nMarkdown report saved to: {md_path}")
+        entry = report_store.save(content, topic)
+        print(f"\nMarkdown report saved as: {entry['name']}")
     
     if output_format in ["pdf", "both"]:
         print("\nPDF export feature coming soon...")
     
-    return content
+    return entry
 
 def main():
     parser = argparse.ArgumentParser(description="AI Research Assistant - Multi-Agent Research System")
-    parser.add_argument("topic", help="Research topic or question")
+    parser.add_argument("topic", nargs="?", help="Research topic or question")
     parser.add_argument("--format", choices=["markdown", "pdf", "both"], 
                        default="markdown", help="Output format")
     parser.add_argument("--depth", choices=["basic", "moderate", "comprehensive"],
                        default="moderate", help="Research depth")
+    parser.add_argument("--refresh", metavar="REPORT",
+                       help="Update an existing report in output/ with newer developments only")
+    parser.add_argument("--profile", action="store_true",
+                       help="Record per-stage CPU, memory and wait time next to the report")
     
     args = parser.parse_args()
     
+    previous = None
+    if args.refresh:
+        try:
+            previous = report_store.info(args.refresh)
+        except FileNotFoundError:
+            parser.error(f"report not found: {args.refresh}")
+        args.topic = args.topic or previous["topic"]
+    if not args.topic:
+        parser.error("a topic is required unless --refresh names a report with a known topic")
+    
     print(f"\n{'='*60}")
     print(f"AI Research Assistant")
     print(f"{'='*60}")
     print(f"Topic: {args.topic}")
     print(f"Depth: {args.depth}")
     print(f"Format: {args.format}")
+    if previous:
+        print(f"Refreshing: {previous['filename']} ({previous['created'][:10]})")
     print(f"{'='*60}\n")
     
+    profiler = RunProfiler(args.topic).start() if args.profile else None
+    
     print("Initializing research crew...")
-    crew = ResearchCrew()
+    crew = ResearchCrew(profiler=profiler)
     
     print("Starting research process...\n")
-    result = crew.run(args.topic)
+    if previous:
+        previous_report = report_store.read(previous["filename"])
+        result = crew.refresh(args.topic, previous_report, previous["created"][:10])
+    else:
+        result = crew.run(args.topic)
     
     print("\n" + "="*60)
     print("Research Complete!")
     print("="*60 + "\n")
     
-    save_report(result, args.topic, args.format)
+    with stage(profiler, "save"):
+        entry = save_report(result, args.topic, args.format)
+    
+    if profiler:
+        profiler.stop()
+        name = entry["name"] if entry else f"{slugify_topic(args.topic)}_{profiler.started.strftime('%Y%m%d_%H%M%S')}"
+        profile_path = profiler.save(report_store.profile_path(name))
+        print(f"Profile saved to: {profile_path}")
+        print("Compare runs with: python profiling.py compare <a.profile.json> <b.profile.json>")
     
     print("\n" + "="*60)
     print("Process Summary:")
@@ -0,0 +1,122 @@
+import re
+
+NO_CHANGES = "NO_CHANGES"
+
+_HEADING = re.compile(r'^(#{1,2})\s+(.+?)\s*#*\s*$')
+_OUTER_FENCE = re.compile(r'^\s*```[\w-]*[ \t]*\n(.*?)\n[ \t]*```\s*$', re.DOTALL)
+
+
+def _normalize(title):
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+
+def strip_code_fence(text):
+    """Remove one code fence wrapping the whole of ``text``, if present.
+
+    Models often return markdown as a ```` ```markdown ```` block, which would
+    otherwise hide every heading inside it.
+    """
+    match = _OUTER_FENCE.match(text)
+    if not match or re.search(r'^[ \t]*```', match.group(1), re.MULTILINE):
+        # Not wrapped, or the "wrapper" is really two separate code blocks
+        return text
+    return match.group(1) + "\n"
+
+
+def split_sections(markdown):
+    """Split a markdown report into (preamble, [(title, body), ...]).
+
+    Sections are delimited by level-2 headings; anything before the first
+    one (usually the report title) is returned as the preamble. Each body
+    includes its own heading line so sections can be re-joined verbatim.
+    """
+    preamble = []
+    sections = []
+    current = None
+    in_fence = False
+    for line in markdown.splitlines(keepends=True):
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line.rstrip("\n"))
+        if match and len(match.group(1)) == 2:
+            current = [match.group(2), [line]]
+            sections.append(current)
+        elif current is None:
+            preamble.append(line)
+        else:
+            current[1].append(line)
+    return "".join(preamble), [(title, "".join(body)) for title, body in sections]
+
+
+def find_section(sections, title):
+    """Return the body of the section titled ``title``, or an empty string."""
+    key = _normalize(title)
+    for candidate, body in sections:
+        if _normalize(candidate) == key:
+            return body
+    return ""
+
+
+def normalize_section(title, text):
+    """Make a generated section start with exactly one ``## title`` heading.
+
+    Models often repeat the heading (at any level) or wrap the section in a
+    report title; those leading headings are dropped and nested level-1/2
+    headings are demoted so the assembled report keeps a single outline.
+    A code fence wrapping the whole section is removed first.
+    """
+    lines = strip_code_fence(text.strip()).strip().splitlines()
+    while lines and (not lines[0].strip() or _HEADING.match(lines[0])):
+        lines.pop(0)
+    body = []
+    in_fence = False
+    for line in lines:
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        body.append(f"### {match.group(2)}" if match else line)
+    return f"## {title}\n\n" + "\n".join(body).strip() + "\n"
+
+
+def assemble_report(topic, sections):
+    """Join ``[(title, text), ...]`` in order under a single report title."""
+    normalized = [(title, normalize_section(title, text)) for title, text in sections]
+    return join_sections(f"# Research Report: {topic}\n\n", normalized)
+
+
+def join_sections(preamble, sections):
+    parts = [preamble] if preamble else []
+    for _, body in sections:
+        if parts and not parts[-1].endswith("\n\n"):
+            parts.append("\n" if parts[-1].endswith("\n") else "\n\n")
+        parts.append(body)
+    return "".join(parts)
+
+
+def merge_sections(previous, patch):
+    """Apply a partial report to a previous one.
+
+    Sections in ``patch`` replace the same-titled sections of ``previous``;
+    new titles are inserted ahead of the References section (or appended
+    when there is none). Untouched sections are kept byte-for-byte. Raises
+    ``ValueError`` if ``patch`` is neither ``NO_CHANGES`` nor any sections.
+    """
+    patch = strip_code_fence(patch)
+    if patch.strip() == NO_CHANGES:
+        return previous
+
+    preamble, sections = split_sections(previous)
+    _, updates = split_sections(patch)
+    if not updates:
+        raise ValueError(f"Refresh output has no '## ' sections and is not {NO_CHANGES}: {patch.strip()[:200]!r}")
+
+    positions = {_normalize(t): i for i, (t, _) in enumerate(sections)}
+    for title, body in updates:
+        key = _normalize(title)
+        if key in positions:
+            sections[positions[key]] = (title, body)
+            continue
+        insert_at = positions.get("references", len(sections))
+        sections.insert(insert_at, (title, body))
+        positions = {_normalize(t): i for i, (t, _) in enumerate(sections)}
+    return join_sections(preamble, sections)
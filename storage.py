@@ -0,0 +1,268 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def slugify_topic(topic):
+    safe_topic = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in topic)
+    return safe_topic.replace(' ', '_').lower()[:50]
+
+
+def _atomic_write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _track_latest(latest, entry):
+    if not entry.get("topic"):
+        return
+    slug = slugify_topic(entry["topic"])
+    if slug not in latest or entry["created"] >= latest[slug]["created"]:
+        latest[slug] = entry
+
+
+class ReportStore:
+    """Content-addressed, compressed report storage.
+
+    Report bodies are stored once per distinct content under
+    ``objects/<2 hex chars>/<rest of sha256>.<codec>``; ``index.jsonl`` maps
+    the human-readable report names (``{safe_topic}_{timestamp}.md``) to
+    their blobs so listing never has to scan the object tree. Plain ``.md``
+    files written before this layout existed are still readable.
+    """
+
+    INDEX_FILE = "index.jsonl"
+    OBJECTS_DIR = "objects"
+
+    def __init__(self, root="output"):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_size = -1
+        # slug -> newest index entry on that topic, kept alongside the index
+        self._latest = {}
+        # slug -> newest legacy report; legacy files are never written, so scanned once
+        self._legacy_latest = None
+
+    @property
+    def codec(self):
+        return "zst" if zstandard is not None else "gz"
+
+    def _index_path(self):
+        return self.root / self.INDEX_FILE
+
+    def _blob_path(self, digest, codec):
+        return self.root / self.OBJECTS_DIR / digest[:2] / f"{digest[2:]}.{codec}"
+
+    def _load_index(self):
+        index_path = self._index_path()
+        size = index_path.stat().st_size if index_path.exists() else 0
+        if size == self._index_size:
+            return self._index
+        index = {}
+        latest = {}
+        if size:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Tolerate a torn final line from an interrupted append
+                        continue
+                    index[entry["name"]] = entry
+                    _track_latest(latest, entry)
+        self._index = index
+        self._latest = latest
+        self._index_size = size
+        return index
+
+    def _compress(self, data):
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=9, mtime=0)
+
+    def _find_blob(self, digest):
+        for codec in ("zst", "gz"):
+            path = self._blob_path(digest, codec)
+            if path.exists():
+                return path, codec
+        return None, None
+
+    def save(self, content, topic, created=None, source=None):
+        """Store a report and return its index entry.
+
+        ``source`` optionally records what produced the report (e.g.
+        ``"prefetch"``) so it can be told apart from on-demand runs.
+        """
+        created = created or datetime.now()
+        data = str(content).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        blob_path, codec = self._find_blob(digest)
+        if blob_path is None:
+            codec = self.codec
+            blob_path = self._blob_path(digest, codec)
+            _atomic_write(blob_path, self._compress(data))
+
+        with self._lock:
+            index = self._load_index()
+            name = f"{slugify_topic(topic)}_{created.strftime('%Y%m%d_%H%M%S')}.md"
+            suffix = 1
+            while name in index and index[name]["digest"] != digest:
+                name = f"{slugify_topic(topic)}_{created.strftime('%Y%m%d_%H%M%S')}_{suffix}.md"
+                suffix += 1
+            if name in index:
+                return index[name]
+            entry = {
+                "name": name,
+                "topic": topic,
+                "digest": digest,
+                "codec": codec,
+                "size": len(data),
+                "created": created.isoformat(),
+            }
+            if source:
+                entry["source"] = source
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self._index_path(), 'ab+') as f:
+                # Terminate a torn final line first so it doesn't swallow this entry
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write((json.dumps(entry) + "\n").encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            index[name] = entry
+            _track_latest(self._latest, entry)
+            self._index_size = self._index_path().stat().st_size
+        return entry
+
+    def path_for(self, entry):
+        return self._blob_path(entry["digest"], entry["codec"])
+
+    def profile_path(self, name):
+        return self.root / "profiles" / f"{Path(name).stem}.profile.json"
+
+    def _legacy_path(self, name):
+        legacy_path = self.root / name
+        if Path(name).name != name or legacy_path.suffix != ".md" or not legacy_path.is_file():
+            raise FileNotFoundError(name)
+        return legacy_path
+
+    def get(self, name):
+        with self._lock:
+            return self._load_index().get(name)
+
+    def open(self, name):
+        """Return a text stream over a report, decompressing as it is read."""
+        entry = self.get(name)
+        if entry is None:
+            legacy_path = self._legacy_path(name)
+            return open(legacy_path, 'r', encoding='utf-8')
+
+        blob_path = self.path_for(entry)
+        if entry["codec"] == "gz":
+            return gzip.open(blob_path, 'rt', encoding='utf-8')
+        if zstandard is None:
+            raise RuntimeError(f"Report {name} is zstd-compressed but zstandard is not installed")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(blob_path, 'rb'), closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def _legacy_info(self, file):
+        stat = file.stat()
+        # Legacy names are "{safe_topic}_{YYYYmmdd}_{HHMMSS}.md"
+        topic = file.stem.rsplit('_', 2)[0].replace('_', ' ')
+        return {
+            "filename": file.name,
+            "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "size": stat.st_size,
+            "topic": topic,
+            "source": None,
+        }
+
+    def _entry_info(self, entry):
+        return {
+            "filename": entry["name"],
+            "created": entry["created"],
+            "size": entry["size"],
+            "topic": entry.get("topic"),
+            "source": entry.get("source"),
+        }
+
+    def info(self, name):
+        """Return the metadata for one report, as listed by ``list``."""
+        entry = self.get(name)
+        if entry is not None:
+            return self._entry_info(entry)
+        legacy_path = self._legacy_path(name)
+        return self._legacy_info(legacy_path)
+
+    def _load_legacy_latest(self):
+        if self._legacy_latest is None:
+            latest = {}
+            if self.root.exists():
+                for file in self.root.glob("*.md"):
+                    report = self._legacy_info(file)
+                    slug = slugify_topic(report["topic"])
+                    if slug not in latest or report["created"] > latest[slug]["created"]:
+                        latest[slug] = report
+            self._legacy_latest = latest
+        return self._legacy_latest
+
+    def latest(self, topic):
+        """Return the newest report on ``topic`` (compared by slug), or None.
+
+        A dictionary lookup rather than a scan, so it is cheap enough to call
+        on every request.
+        """
+        slug = slugify_topic(topic)
+        with self._lock:
+            self._load_index()
+            entry = self._latest.get(slug)
+            legacy = self._load_legacy_latest().get(slug)
+        report = self._entry_info(entry) if entry is not None else None
+        if legacy is not None and (report is None or legacy["created"] > report["created"]):
+            return legacy
+        return report
+
+    def list(self):
+        """Return report metadata, newest first."""
+        with self._lock:
+            entries = list(self._load_index().values())
+        reports = [self._entry_info(e) for e in entries]
+        known = {r["filename"] for r in reports}
+        if self.root.exists():
+            for file in self.root.glob("*.md"):
+                if file.name not in known:
+                    reports.append(self._legacy_info(file))
+        reports.sort(key=lambda r: r["created"], reverse=True)
+        return reports
@@ -1,5 +1,18 @@
 from crewai import Task
 
+REPORT_SECTIONS = [
+    "Executive Summary",
+    "Introduction",
+    "Key Findings",
+    "Analysis and Insights",
+    "Conclusion",
+    "References",
+]
+
+# Written first, in parallel; the rest are written from the finished body
+BODY_SECTIONS = ["Introduction", "Key Findings", "Analysis and Insights"]
+SUMMARY_SECTIONS = [title for title in REPORT_SECTIONS if title not in BODY_SECTIONS]
+
 class ResearchTasks:
     def research_task(self, agent, topic):
         return Task(
@@ -17,7 +30,7 @@ class ResearchTasks:
             expected_output="Detailed research findings with source citations"
         )
     
-    def analysis_task(self, agent, topic):
+    def analysis_task(self, agent, topic, context=None):
         return Task(
             description=f"""Analyze the research findings on: {topic}
             
@@ -30,27 +43,123 @@ class ResearchTasks:
             
             Provide a structured analysis with clear insights.""",
             agent=agent,
-            expected_output="Comprehensive analysis with validated insights"
+            expected_output="Comprehensive analysis with validated insights",
+            context=context
         )
     
-    def writing_task(self, agent, topic):
+    def outline_task(self, agent, topic, context=None):
+        sections = "\n".join(f"            ## {title}" for title in REPORT_SECTIONS)
+        return Task(
+            description=f"""Plan a professional research report on: {topic}
+            
+            Using the research findings and analysis, write a short outline with
+            exactly these level-2 headings, in this order:
+{sections}
+            
+            Under each heading list 3-6 terse bullet points naming the facts,
+            insights and sources that section must cover. Assign every point to
+            one section only so sections can be written independently without
+            repeating each other. Do not write the report itself.""",
+            agent=agent,
+            expected_output="Markdown outline with one '## ' heading per report section and bullet points under each",
+            context=context
+        )
+    
+    def section_task(self, agent, topic, title, outline, findings, analysis, body=None):
+        if body:
+            consistency = f"""
+            
+            The body of the report is already written. Only summarize, conclude
+            on or cite what it actually says, so this section agrees with it.
+            For References, list exactly the sources the body cites.
+            
+            Report body:
+            ----
+            {body}
+            ----"""
+        else:
+            consistency = ""
         return Task(
-            description=f"""Create a professional research report on: {topic}
+            description=f"""Write the '{title}' section of a professional research report on: {topic}
+            
+            Cover the points planned for this section:
+            {outline or '- Use your judgement based on the material below'}
             
             Your objectives:
-            1. Structure the report with clear sections:
-               - Executive Summary
-               - Introduction
-               - Key Findings
-               - Analysis and Insights
-               - Conclusion
-               - References
+            1. Write only this section, starting with the heading '## {title}'
             2. Write in a clear, professional tone
-            3. Include all relevant citations
-            4. Ensure logical flow and coherence
-            5. Format for readability
+            3. Cite sources from the research findings where relevant
+            4. Do not cover points planned for other sections
+            
+            Research findings:
+            ----
+            {findings}
+            ----
+            
+            Analysis:
+            ----
+            {analysis}
+            ----{consistency}""",
+            agent=agent,
+            expected_output=f"The '{title}' section of the report in markdown"
+        )
+    
+    def refresh_research_task(self, agent, topic, since):
+        return Task(
+            description=f"""Find new developments on: {topic}
+            
+            An existing report on this topic was written on {since}.
+            Only look for information published or changed after that date.
+            
+            Your objectives:
+            1. Identify new facts, statistics, releases and announcements since {since}
+            2. Note findings that contradict or supersede earlier knowledge
+            3. Document all sources for citations
+            
+            Do not restate background that was already true before {since}.
+            If nothing material has changed, say so plainly.""",
+            agent=agent,
+            expected_output="Concise list of developments since the previous report, with source citations"
+        )
+    
+    def refresh_analysis_task(self, agent, topic, previous_report):
+        return Task(
+            description=f"""Compare the new developments on: {topic}
+            against the findings of the previous report below.
+            
+            Your objectives:
+            1. Validate the accuracy of the new information
+            2. Mark which previous findings are confirmed, outdated or contradicted
+            3. List the report sections (by their exact '## ' heading) that need updating
+            4. Propose any new section only if the developments do not fit an existing one
+            
+            Previous report:
+            ----
+            {previous_report}
+            ----""",
+            agent=agent,
+            expected_output="List of affected sections with the specific changes each one needs"
+        )
+    
+    def refresh_writing_task(self, agent, topic, previous_report):
+        return Task(
+            description=f"""Update the previous research report on: {topic}
+            using the analyst's list of affected sections.
+            
+            Your objectives:
+            1. Rewrite ONLY the affected sections, each starting with its exact
+               '## ' heading from the previous report
+            2. Add new sources to a '## References' section containing the full,
+               updated reference list if any citations changed
+            3. Keep the tone and formatting of the previous report
+            
+            Do not output unaffected sections. If nothing needs to change,
+            output exactly NO_CHANGES.
             
-            Produce a publication-ready markdown report.""",
+            Previous report:
+            ----
+            {previous_report}
+            ----""",
             agent=agent,
-            expected_output="Well-structured professional report in markdown format"
+            expected_output="Markdown containing only the updated sections, or NO_CHANGES"
         )